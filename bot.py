@@ -5,11 +5,17 @@ Optimizado para Render.com con health check mejorado
 """
 
 import os
+import re
+import random
 import json
+import signal
 import logging
 import asyncio
+import threading
+import time
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
 from aiohttp import web
-from datetime import datetime
 
 from telegram import Update, ReplyKeyboardRemove
 from telegram.ext import (
@@ -21,9 +27,6 @@ from telegram.ext import (
     ConversationHandler
 )
 
-import gspread
-from google.oauth2.service_account import Credentials
-
 # ==================== CONFIGURACIÓN ====================
 
 TELEGRAM_TOKEN = os.environ.get('TELEGRAM_TOKEN')
@@ -38,23 +41,200 @@ logger = logging.getLogger(__name__)
 
 # ==================== ESTADOS ====================
 
-NOMBRE, PLACA, KM_INICIAL, KM_FINAL, COMENTARIOS = range(5)
+NOMBRE, PLACA, KM_INICIAL, KM_FINAL, COMENTARIOS, REPORTE_RAPIDO = range(6)
+
+# ==================== REPORTE ====================
+
+@dataclass(slots=True)
+class EstadoReporte:
+    """Datos del reporte en curso, en el mismo orden que las columnas"""
+    fecha_hora: str = ''
+    nombre: str = ''
+    placa: str = ''
+    km_inicial: float = 0.0
+    km_final: float = 0.0
+    total_km: float = 0.0
+    comentarios: str = ''
+
+# Filtro compartido por todos los estados: texto libre que no sea comando
+TEXTO_SIN_COMANDO = filters.TEXT & ~filters.COMMAND
+
+# Límite de caracteres guardados por comentario
+MAX_COMENTARIOS = 500
+
+# ==================== MENSAJES ====================
+
+MENSAJE_INICIO = (
+    "👋 Hola.\n\n"
+    "Para llenar el reporte debes tener:\n"
+    "• Kilometraje inicial\n"
+    "• Kilometraje final\n\n"
+    "El bot calculará automáticamente el total de kilómetros recorridos.\n\n"
+    "Usa /reporte para comenzar."
+)
+
+MENSAJE_AYUDA = (
+    "📖 Comandos disponibles:\n\n"
+    "/start - Iniciar el bot\n"
+    "/reporte - Crear un nuevo reporte\n"
+    "/reporte_rapido - Crear un reporte en un solo mensaje\n"
+    "/ayuda - Mostrar esta ayuda\n"
+    "/cancelar - Cancelar reporte actual\n\n"
+    "💡 El bot calcula automáticamente el total de kilómetros recorridos."
+)
+
+ERROR_KM_INICIAL = (
+    "⚠️ Por favor, escribe solo números.\n"
+    "Ejemplo: 1000 o 1000.5\n\n"
+    "Escribe el kilometraje INICIAL:"
+)
+
+ERROR_KM_FINAL = (
+    "⚠️ Por favor, escribe solo números.\n"
+    "Ejemplo: 1150 o 1150.5\n\n"
+    "Escribe el kilometraje FINAL:"
+)
+
+MENSAJE_REPORTE_RAPIDO = (
+    "⚡ Escribe todo el reporte en un solo mensaje, separado por |\n\n"
+    "nombre | placa | km inicial | km final | comentarios\n\n"
+    "Ejemplo:\n"
+    "Juan Pérez | ABC123 | 1000 | 1150 | sin comentarios"
+)
+
+ERROR_REPORTE_RAPIDO = (
+    "⚠️ El mensaje debe tener 5 datos separados por |\n"
+    "nombre | placa | km inicial | km final | comentarios\n\n"
+    "Escribe el reporte de nuevo:"
+)
+
+ERROR_KM_RAPIDO = (
+    "⚠️ Los kilometrajes deben ser solo números y el final no puede "
+    "ser menor que el inicial.\n\n"
+    "Escribe el reporte de nuevo:"
+)
+
+PLANTILLA_CALCULO = (
+    "📊 Cálculo automático:\n\n"
+    "KM Final: {km_final}\n"
+    "KM Inicial: {km_inicial}\n"
+    "━━━━━━━━━━━━━━━\n"
+    "✅ Total recorrido: {total} km\n\n"
+    "Ahora agrega comentarios.\n"
+    "Si no tienes comentarios escribe: sin comentarios"
+)
+
+PLANTILLA_RESUMEN = (
+    "✅ Reporte guardado correctamente.\n\n"
+    "📋 Resumen:\n"
+    "• Nombre: %s\n"
+    "• Placa: %s\n"
+    "• KM Inicial: %s\n"
+    "• KM Final: %s\n"
+    "• Total Recorrido: %s km\n\n"
+    "Usa /reporte para registrar otro."
+)
+
+MENSAJE_GUARDADO_INCIERTO = (
+    "⚠️ No se pudo confirmar si el reporte se guardó.\n"
+    "Es posible que ya esté en la hoja: revísalo antes de enviarlo "
+    "de nuevo para no duplicarlo, o contacta al administrador."
+)
+
+# ==================== TECLADOS ====================
+
+# Inmutable: se construye una vez y se reutiliza en cada respuesta
+QUITAR_TECLADO = ReplyKeyboardRemove()
 
 # ==================== GOOGLE CONFIG ====================
 
 SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
 
+# Worksheet cacheado: credenciales, autorización y apertura del documento
+# se hacen una sola vez por proceso en lugar de en cada reporte
+_sheet = None
+_sheet_lock = threading.Lock()
+
+# Reintentos ante límites de cuota (429) y servicio no disponible (503),
+# casos en los que Google no aplicó la escritura. Un presupuesto de 5
+# intentos solo es aceptable porque los handlers que guardan no bloquean
+# el despacho (block=False): mientras dura el backoff esperan únicamente
+# los chats de ese lote, el resto del bot sigue respondiendo
+REINTENTOS_SHEETS = 5
+CODIGOS_REINTENTABLES = {429, 503}
+
+# values.append no es idempotente: con estos códigos Google pudo haber
+# aplicado el append, así que reintentar podría duplicar filas
+CODIGOS_AMBIGUOS = {500, 502, 504}
+
+# Resultado de guardar un reporte; INCIERTO significa que Google pudo
+# haber aplicado la escritura aunque respondió con error
+GUARDADO_OK, GUARDADO_FALLIDO, GUARDADO_INCIERTO = range(3)
+
+class EscrituraIncierta(Exception):
+    """La escritura falló, pero Google pudo haberla aplicado"""
+
+# Cola de filas pendientes: los reportes que llegan mientras hay una
+# escritura en curso se envían juntos en un solo append_rows. Solo hay
+# lotes porque los handlers que guardan son no bloqueantes (block=False):
+# con el despacho en serie de PTB nunca habría más de una fila en cola
+MAX_FILAS_POR_LOTE = 20
+_cola_filas = asyncio.Queue()
+
+# Hilos dedicados a Sheets: acotan las conexiones simultáneas a Google y
+# no compiten con el executor por defecto del event loop
+_sheets_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='sheets')
+# Tiempo máximo que espera el chofer de ese chat (no el resto del bot,
+# que sigue atendiendo updates), no la escritura: alcanza para los
+# ~15 s de backoff de una ráfaga de 429/503 con peticiones rápidas, pero
+# peticiones lentas, la reconexión tras un 401 o esperar en la cola detrás
+# de otro lote pueden superarlo; entonces se avisa que el reporte quizá
+# no se guardó y la fila aún puede escribirse después
+GUARDADO_TIMEOUT = 30.0
+
+# Límite (conexión, lectura) en segundos de cada petición a Sheets: sin él
+# una lectura colgada bloquearía para siempre al único escritor. Vencer el
+# de lectura deja la escritura incierta (la petición ya se había enviado)
+SHEETS_HTTP_TIMEOUT = (5, 20)
+
+# Marca local de que los encabezados ya existen: evita leer la fila 1
+# en cada reinicio del proceso dentro del mismo contenedor
+ENCABEZADOS_OK = '/tmp/.bot_headers_ok'
+
+# gspread y google.oauth2 se importan en el primer uso: son pesados y
+# retrasarían el arranque del health check en Render
+
 def obtener_credenciales():
+    from google.oauth2.service_account import Credentials
+
     credentials_dict = json.loads(GOOGLE_CREDENTIALS_JSON)
     return Credentials.from_service_account_info(credentials_dict, scopes=SCOPES)
 
 def obtener_sheet():
-    creds = obtener_credenciales()
-    client = gspread.authorize(creds)
-    return client.open_by_key(GOOGLE_SHEET_ID).sheet1
+    global _sheet
+    if _sheet is None:
+        with _sheet_lock:
+            if _sheet is None:
+                import gspread
+
+                creds = obtener_credenciales()
+                client = gspread.authorize(creds)
+                client.set_timeout(SHEETS_HTTP_TIMEOUT)
+                _sheet = client.open_by_key(GOOGLE_SHEET_ID).sheet1
+    return _sheet
+
+def invalidar_sheet():
+    """Descarta el Worksheet cacheado para reconstruirlo en el próximo uso"""
+    global _sheet
+    with _sheet_lock:
+        _sheet = None
 
 def inicializar_sheet():
     sheet = obtener_sheet()
+    if os.path.exists(ENCABEZADOS_OK):
+        logger.info("Google Sheets ya inicializado")
+        return
+
     if not sheet.row_values(1):
         headers = [
             'Fecha y Hora',
@@ -70,24 +250,118 @@ def inicializar_sheet():
     else:
         logger.info("Google Sheets ya inicializado")
 
-def guardar_reporte(datos):
+    # La marca es solo una caché: si no se puede escribir, el bot sigue
     try:
-        sheet = obtener_sheet()
-        fila = [
-            datos['fecha_hora'],
-            datos['nombre'],
-            datos['placa'],
-            datos['km_inicial'],
-            datos['km_final'],
-            datos['total_km'],
-            datos['comentarios']
-        ]
-        sheet.append_row(fila)
-        logger.info(f"Reporte guardado para {datos['nombre']}")
-        return True
-    except Exception as e:
-        logger.error(f"Error guardando en Sheets: {e}")
-        return False
+        open(ENCABEZADOS_OK, 'w').close()
+    except OSError as e:
+        logger.warning(f"No se pudo crear {ENCABEZADOS_OK}: {e}")
+
+def append_con_reintentos(sheet, filas):
+    """Agrega las filas con backoff exponencial ante errores transitorios"""
+    from gspread.exceptions import APIError
+    from requests.exceptions import ReadTimeout
+
+    for intento in range(REINTENTOS_SHEETS):
+        try:
+            # Una sola llamada a values.append para todo el lote;
+            # table_range='A1' evita que Sheets busque la tabla en la hoja
+            sheet.append_rows(
+                filas,
+                value_input_option='USER_ENTERED',
+                insert_data_option='INSERT_ROWS',
+                table_range='A1'
+            )
+            return
+        except ReadTimeout as e:
+            # La petición ya se envió: Google pudo aplicarla sin responder
+            logger.error(
+                f"Sheets no respondió a tiempo al agregar {len(filas)} "
+                "fila(s); pudieron guardarse, no se reintenta para no duplicarlas"
+            )
+            raise EscrituraIncierta(e) from e
+        except APIError as e:
+            if e.response.status_code in CODIGOS_AMBIGUOS:
+                logger.error(
+                    f"Sheets respondió {e.response.status_code} al agregar "
+                    f"{len(filas)} fila(s); pudieron guardarse, no se reintenta "
+                    "para no duplicarlas"
+                )
+                raise EscrituraIncierta(e) from e
+            ultimo = intento == REINTENTOS_SHEETS - 1
+            if e.response.status_code not in CODIGOS_REINTENTABLES or ultimo:
+                raise
+            # Jitter para que varios reintentos no golpeen la cuota a la vez
+            espera = 2 ** intento + random.random()
+            logger.warning(
+                f"Sheets respondió {e.response.status_code}, "
+                f"reintentando en {espera:.1f}s"
+            )
+            time.sleep(espera)
+
+def escribir_filas(filas):
+    """Escribe un lote de filas en Sheets (bloqueante, se usa en un hilo)"""
+    from google.auth.exceptions import RefreshError
+    from gspread.exceptions import APIError
+
+    try:
+        append_con_reintentos(obtener_sheet(), filas)
+    except (APIError, RefreshError) as e:
+        # Token o sesión caducados: se reconstruye el cliente una vez
+        if isinstance(e, APIError) and e.response.status_code != 401:
+            raise
+        logger.warning(f"Credenciales de Sheets inválidas, reconectando: {e}")
+        invalidar_sheet()
+        append_con_reintentos(obtener_sheet(), filas)
+
+async def escritor_sheets():
+    """Vacía la cola de filas en lotes mientras el bot esté corriendo"""
+    while True:
+        lote = [await _cola_filas.get()]
+        while len(lote) < MAX_FILAS_POR_LOTE and not _cola_filas.empty():
+            lote.append(_cola_filas.get_nowait())
+
+        filas = [fila for fila, _ in lote]
+        try:
+            # gspread hace I/O bloqueante: se ejecuta fuera del event loop
+            await asyncio.get_running_loop().run_in_executor(
+                _sheets_executor, escribir_filas, filas
+            )
+            logger.info(f"{len(filas)} fila(s) guardadas en Sheets")
+            estado = GUARDADO_OK
+        except EscrituraIncierta:
+            estado = GUARDADO_INCIERTO
+        except Exception as e:
+            logger.error(f"Error guardando en Sheets: {e}")
+            estado = GUARDADO_FALLIDO
+
+        for _, resultado in lote:
+            if not resultado.done():
+                resultado.set_result(estado)
+
+def como_texto(valor):
+    """Fuerza a Sheets a tratar el valor como texto con USER_ENTERED"""
+    # El apóstrofo inicial no se muestra y evita que un comentario
+    # como "=..." se evalúe como fórmula o una placa se lea como fecha
+    return "'" + valor
+
+async def guardar_reporte(reporte):
+    """Encola el reporte y espera a que su lote se escriba en Sheets"""
+    fila = [
+        reporte.fecha_hora,
+        como_texto(reporte.nombre),
+        como_texto(reporte.placa),
+        reporte.km_inicial,
+        reporte.km_final,
+        reporte.total_km,
+        como_texto(reporte.comentarios)
+    ]
+    resultado = asyncio.get_running_loop().create_future()
+    await _cola_filas.put((fila, resultado))
+
+    estado = await resultado
+    if estado == GUARDADO_OK:
+        logger.info(f"Reporte guardado para {reporte.nombre}")
+    return estado
 
 # ==================== SERVIDOR WEB PARA RENDER ====================
 
@@ -101,123 +375,184 @@ async def start_web_server():
     app.router.add_get('/', health_check)
     app.router.add_get('/health', health_check)
     
-    runner = web.AppRunner(app)
+    # Sin access log: Render consulta el health check constantemente
+    runner = web.AppRunner(app, access_log=None)
     await runner.setup()
     site = web.TCPSite(runner, '0.0.0.0', PORT)
     await site.start()
     logger.info(f"🌐 Servidor web iniciado en puerto {PORT}")
 
+# ==================== VALIDACIÓN ====================
+
+# Kilometraje: dígitos, o grupos de miles completos separados por coma,
+# y parte decimal opcional con punto (1000, 1,000, 1000.5). Rechaza
+# agrupaciones mal formadas como 1,,0 o 1000,5 (coma decimal). La parte
+# entera se limita a 9 dígitos: cadenas más largas darían valores absurdos
+# o inf, que no se pueden enviar a Sheets como JSON
+MAX_DIGITOS_KM = 9
+PATRON_KM = re.compile(
+    r'(?:\d{1,3}(?:,\d{3}){1,2}|\d{1,%d})(?:\.\d+)?' % MAX_DIGITOS_KM,
+    re.ASCII
+)
+
+def parsear_km(km_text):
+    """Convierte el texto a kilómetros; devuelve None si no es válido"""
+    # Caso más común: solo dígitos, sin comas ni decimales
+    if len(km_text) <= MAX_DIGITOS_KM and km_text.isascii() and km_text.isdigit():
+        return float(km_text)
+    if not PATRON_KM.fullmatch(km_text):
+        return None
+    return float(km_text.replace(',', ''))
+
+def formatear_km(km):
+    """Muestra el kilometraje sin decimales sobrantes (1000, 1000.5)"""
+    return ('%.2f' % km).rstrip('0').rstrip('.')
+
 # ==================== BOT ====================
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await update.message.reply_text(
-        "👋 Hola.\n\n"
-        "Para llenar el reporte debes tener:\n"
-        "• Kilometraje inicial\n"
-        "• Kilometraje final\n\n"
-        "El bot calculará automáticamente el total de kilómetros recorridos.\n\n"
-        "Usa /reporte para comenzar."
-    )
+    await update.message.reply_text(MENSAJE_INICIO)
 
 async def iniciar_reporte(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data.clear()
+    context.user_data['reporte'] = EstadoReporte()
     await update.message.reply_text("Escribe tu nombre completo:")
     return NOMBRE
 
 async def nombre(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    context.user_data['nombre'] = update.message.text
+    context.user_data['reporte'].nombre = update.message.text
     await update.message.reply_text("Escribe la placa del vehículo:")
     return PLACA
 
 async def placa(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    context.user_data['placa'] = update.message.text.upper()
+    context.user_data['reporte'].placa = update.message.text.upper()
     await update.message.reply_text("Escribe el kilometraje INICIAL:")
     return KM_INICIAL
 
 async def km_inicial(update: Update, context: ContextTypes.DEFAULT_TYPE):
     km_text = update.message.text.strip()
-    
-    try:
-        km_numero = float(km_text.replace(',', ''))
-        context.user_data['km_inicial'] = km_text
-        context.user_data['km_inicial_numero'] = km_numero
-        await update.message.reply_text("Escribe el kilometraje FINAL:")
-        return KM_FINAL
-    except ValueError:
-        await update.message.reply_text(
-            "⚠️ Por favor, escribe solo números.\n"
-            "Ejemplo: 1000 o 1000.5\n\n"
-            "Escribe el kilometraje INICIAL:"
-        )
+    km_numero = parsear_km(km_text)
+
+    if km_numero is None:
+        await update.message.reply_text(ERROR_KM_INICIAL)
         return KM_INICIAL
 
+    context.user_data['reporte'].km_inicial = km_numero
+    await update.message.reply_text("Escribe el kilometraje FINAL:")
+    return KM_FINAL
+
 async def km_final(update: Update, context: ContextTypes.DEFAULT_TYPE):
     km_text = update.message.text.strip()
-    
-    try:
-        km_numero = float(km_text.replace(',', ''))
-        context.user_data['km_final'] = km_text
-        context.user_data['km_final_numero'] = km_numero
-        
-        km_inicial = context.user_data['km_inicial_numero']
-        total_km = km_numero - km_inicial
-        
-        if total_km < 0:
-            await update.message.reply_text(
-                "⚠️ El kilometraje final no puede ser menor que el inicial.\n\n"
-                f"Kilometraje Inicial: {context.user_data['km_inicial']}\n"
-                f"Kilometraje Final ingresado: {km_text}\n\n"
-                "Por favor, escribe el kilometraje FINAL correcto:"
-            )
-            return KM_FINAL
-        
-        context.user_data['total_km'] = str(round(total_km, 2))
-        
-        await update.message.reply_text(
-            f"📊 Cálculo automático:\n\n"
-            f"KM Final: {km_text}\n"
-            f"KM Inicial: {context.user_data['km_inicial']}\n"
-            f"━━━━━━━━━━━━━━━\n"
-            f"✅ Total recorrido: {context.user_data['total_km']} km\n\n"
-            "Ahora agrega comentarios.\n"
-            "Si no tienes comentarios escribe: sin comentarios"
-        )
-        return COMENTARIOS
-        
-    except ValueError:
+    km_numero = parsear_km(km_text)
+
+    if km_numero is None:
+        await update.message.reply_text(ERROR_KM_FINAL)
+        return KM_FINAL
+
+    reporte = context.user_data['reporte']
+    km_inicial = reporte.km_inicial
+    total_km = km_numero - km_inicial
+
+    if total_km < 0:
         await update.message.reply_text(
-            "⚠️ Por favor, escribe solo números.\n"
-            "Ejemplo: 1150 o 1150.5\n\n"
-            "Escribe el kilometraje FINAL:"
+            "⚠️ El kilometraje final no puede ser menor que el inicial.\n\n"
+            f"Kilometraje Inicial: {formatear_km(km_inicial)}\n"
+            f"Kilometraje Final ingresado: {km_text}\n\n"
+            "Por favor, escribe el kilometraje FINAL correcto:"
         )
         return KM_FINAL
 
+    reporte.km_final = km_numero
+    reporte.total_km = round(total_km, 2)
+
+    await update.message.reply_text(
+        PLANTILLA_CALCULO.format(
+            km_final=formatear_km(km_numero),
+            km_inicial=formatear_km(km_inicial),
+            total=formatear_km(reporte.total_km)
+        )
+    )
+    return COMENTARIOS
+
 async def comentarios(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    context.user_data['comentarios'] = update.message.text
-    context.user_data['fecha_hora'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    context.user_data['reporte'].comentarios = update.message.text[:MAX_COMENTARIOS]
+    return await finalizar_reporte(update, context)
 
-    await update.message.reply_text("💾 Guardando reporte...")
+async def iniciar_reporte_rapido(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    context.user_data.clear()
+    await update.message.reply_text(MENSAJE_REPORTE_RAPIDO)
+    return REPORTE_RAPIDO
+
+async def reporte_rapido(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Procesa el reporte completo enviado en un solo mensaje"""
+    partes = [parte.strip() for parte in update.message.text.split('|', 4)]
+    if len(partes) != 5 or not partes[0] or not partes[1]:
+        await update.message.reply_text(ERROR_REPORTE_RAPIDO)
+        return REPORTE_RAPIDO
+
+    nombre, placa, km_inicial_text, km_final_text, comentarios = partes
+    km_inicial = parsear_km(km_inicial_text)
+    km_final = parsear_km(km_final_text)
+    if km_inicial is None or km_final is None or km_final < km_inicial:
+        await update.message.reply_text(ERROR_KM_RAPIDO)
+        return REPORTE_RAPIDO
+
+    context.user_data['reporte'] = EstadoReporte(
+        nombre=nombre,
+        placa=placa.upper(),
+        km_inicial=km_inicial,
+        km_final=km_final,
+        total_km=round(km_final - km_inicial, 2),
+        comentarios=comentarios[:MAX_COMENTARIOS]
+    )
+    return await finalizar_reporte(update, context)
+
+async def finalizar_reporte(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Guarda el reporte completo en Sheets y envía el resumen"""
+    reporte = context.user_data['reporte']
+    t = time.localtime()
+    reporte.fecha_hora = '%04d-%02d-%02d %02d:%02d:%02d' % (
+        t.tm_year, t.tm_mon, t.tm_mday, t.tm_hour, t.tm_min, t.tm_sec
+    )
 
+    # La escritura arranca antes del aviso de "Guardando" para que ambas
+    # latencias se solapen
+    guardado = asyncio.create_task(
+        asyncio.wait_for(guardar_reporte(reporte), timeout=GUARDADO_TIMEOUT)
+    )
     try:
-        exito = guardar_reporte(context.user_data)
+        await update.message.reply_text("💾 Guardando reporte...")
+    except Exception as e:
+        # El aviso es solo informativo: el resultado lo decide el guardado
+        logger.warning(f"No se pudo enviar el aviso de guardado: {e}")
 
-        if exito:
-            await update.message.reply_text(
-                "✅ Reporte guardado correctamente.\n\n"
-                f"📋 Resumen:\n"
-                f"• Nombre: {context.user_data['nombre']}\n"
-                f"• Placa: {context.user_data['placa']}\n"
-                f"• KM Inicial: {context.user_data['km_inicial']}\n"
-                f"• KM Final: {context.user_data['km_final']}\n"
-                f"• Total Recorrido: {context.user_data['total_km']} km\n\n"
-                "Usa /reporte para registrar otro."
-            )
+    try:
+        estado = await guardado
+
+        if estado == GUARDADO_OK:
+            await update.message.reply_text(PLANTILLA_RESUMEN % (
+                reporte.nombre,
+                reporte.placa,
+                formatear_km(reporte.km_inicial),
+                formatear_km(reporte.km_final),
+                formatear_km(reporte.total_km)
+            ))
+        elif estado == GUARDADO_INCIERTO:
+            await update.message.reply_text(MENSAJE_GUARDADO_INCIERTO)
         else:
             await update.message.reply_text(
                 "❌ Error al guardar el reporte.\n"
                 "Contacta al administrador."
             )
 
+    except asyncio.TimeoutError:
+        logger.error(f"Guardado sin respuesta tras {GUARDADO_TIMEOUT}s")
+        await update.message.reply_text(
+            "⚠️ Google Sheets está tardando en responder.\n"
+            "Es posible que el reporte no se haya guardado.\n"
+            "Contacta al administrador."
+        )
+
     except Exception as e:
         logger.error(f"Error guardando: {e}")
         await update.message.reply_text(
@@ -225,24 +560,20 @@ async def comentarios(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "Contacta al administrador."
         )
 
+    # Estado terminal: no se conserva nada del reporte en memoria
+    context.user_data.clear()
     return ConversationHandler.END
 
 async def cancelar(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(
         "Reporte cancelado.",
-        reply_markup=ReplyKeyboardRemove()
+        reply_markup=QUITAR_TECLADO
     )
+    context.user_data.clear()
     return ConversationHandler.END
 
 async def ayuda(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await update.message.reply_text(
-        "📖 Comandos disponibles:\n\n"
-        "/start - Iniciar el bot\n"
-        "/reporte - Crear un nuevo reporte\n"
-        "/ayuda - Mostrar esta ayuda\n"
-        "/cancelar - Cancelar reporte actual\n\n"
-        "💡 El bot calcula automáticamente el total de kilómetros recorridos."
-    )
+    await update.message.reply_text(MENSAJE_AYUDA)
 
 async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE):
     logger.error(f"Error global: {context.error}")
@@ -256,27 +587,44 @@ async def main():
         logger.error("❌ Faltan variables de entorno.")
         return
 
+    # Iniciar servidor web antes que nada para responder al health check
+    await start_web_server()
+
     try:
-        inicializar_sheet()
+        # Fuera del event loop para que el health check siga respondiendo
+        await asyncio.get_running_loop().run_in_executor(
+            _sheets_executor, inicializar_sheet
+        )
         logger.info("✅ Google Sheets inicializado correctamente")
     except Exception as e:
         logger.error(f"❌ Error al inicializar Google Sheets: {e}")
         return
 
-    # Iniciar servidor web
-    await start_web_server()
+    # Escritor en segundo plano que agrupa los reportes en lotes
+    escritor = asyncio.create_task(escritor_sheets())
 
     # Configurar bot
     application = Application.builder().token(TELEGRAM_TOKEN).build()
 
     conv_handler = ConversationHandler(
-        entry_points=[CommandHandler('reporte', iniciar_reporte)],
+        entry_points=[
+            CommandHandler('reporte', iniciar_reporte),
+            CommandHandler('reporte_rapido', iniciar_reporte_rapido),
+        ],
         states={
-            NOMBRE: [MessageHandler(filters.TEXT & ~filters.COMMAND, nombre)],
-            PLACA: [MessageHandler(filters.TEXT & ~filters.COMMAND, placa)],
-            KM_INICIAL: [MessageHandler(filters.TEXT & ~filters.COMMAND, km_inicial)],
-            KM_FINAL: [MessageHandler(filters.TEXT & ~filters.COMMAND, km_final)],
-            COMENTARIOS: [MessageHandler(filters.TEXT & ~filters.COMMAND, comentarios)],
+            NOMBRE: [MessageHandler(TEXTO_SIN_COMANDO, nombre)],
+            PLACA: [MessageHandler(TEXTO_SIN_COMANDO, placa)],
+            KM_INICIAL: [MessageHandler(TEXTO_SIN_COMANDO, km_inicial)],
+            KM_FINAL: [MessageHandler(TEXTO_SIN_COMANDO, km_final)],
+            # Los pasos que guardan en Sheets no bloquean el despacho de
+            # updates: mientras se espera a Google el bot sigue atendiendo
+            # otros chats y sus reportes se agrupan en el mismo lote
+            COMENTARIOS: [
+                MessageHandler(TEXTO_SIN_COMANDO, comentarios, block=False)
+            ],
+            REPORTE_RAPIDO: [
+                MessageHandler(TEXTO_SIN_COMANDO, reporte_rapido, block=False)
+            ],
         },
         fallbacks=[CommandHandler('cancelar', cancelar)],
         allow_reentry=True,
@@ -290,16 +638,32 @@ async def main():
     logger.info("🤖 Bot iniciado correctamente")
     logger.info("Bot funcionando 24/7 en Render.com")
     
-    # Inicializar y ejecutar el bot
-    await application.initialize()
-    await application.start()
-    await application.updater.start_polling(
-        allowed_updates=Update.ALL_TYPES,
-        drop_pending_updates=True
-    )
-    
-    # Mantener el bot corriendo
-    await asyncio.Event().wait()
+    # Inicializar y ejecutar el bot; `async with` garantiza el shutdown
+    # del cliente HTTP (y su pool de conexiones) al salir
+    async with application:
+        await application.start()
+        # Solo mensajes (lo único que maneja el bot) y long polling largo
+        # para que Telegram retenga la petición hasta que haya updates
+        await application.updater.start_polling(
+            allowed_updates=[Update.MESSAGE],
+            timeout=50,
+            drop_pending_updates=True
+        )
+
+        # Mantener el bot corriendo hasta que Render (SIGTERM) o Ctrl+C
+        # (SIGINT) pidan detenerlo
+        detener = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, detener.set)
+
+        try:
+            await detener.wait()
+            logger.info("🛑 Señal de apagado recibida, deteniendo el bot")
+        finally:
+            await application.updater.stop()
+            await application.stop()
+            escritor.cancel()
 
 if __name__ == "__main__":
     asyncio.run(main())